@@ -1,24 +1,37 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, send_from_directory, abort
 from dotenv import load_dotenv
+from waitress import serve
+from werkzeug.security import safe_join
 import yt_dlp
 from yt_dlp.utils import sanitize_filename
 import os
+import re
+import mimetypes
 import urllib.parse
 import subprocess
 import shutil
+import tempfile
 import threading
 import time
+import random
 import json
+import sqlite3
+import atexit
 import uuid
 import logging
 import xml.etree.ElementTree as ET
-from collections import deque
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("YTFIN_SECRET", "change-this-secret")
+# Let a fronting Apache/lighttpd send files via X-Sendfile
+app.use_x_sendfile = os.environ.get("YTFIN_X_SENDFILE") == "1"
+# Responses are built from ordered dicts; skip re-sorting keys on every jsonify
+app.json.sort_keys = False
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,22 +41,117 @@ logging.basicConfig(
 # Create downloads directory
 DOWNLOAD_DIR = os.environ.get("YTFIN_DOWNLOAD_DIR", "downloads")
 Path(DOWNLOAD_DIR).mkdir(parents=True, exist_ok=True)
+DOWNLOAD_DIR_PATH = Path(DOWNLOAD_DIR).resolve()
+
+# Persist yt-dlp's player JS / signature cache across restarts
+YTDLP_CACHE_DIR = os.environ.get("YTFIN_CACHE_DIR", ".ytdlp-cache")
+Path(YTDLP_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+# Cached player data older than this is dropped so stale JS gets refetched
+YTDLP_CACHE_MAX_AGE_SECONDS = int(os.environ.get("YTFIN_CACHE_MAX_AGE_DAYS", "7")) * 24 * 60 * 60
 
 PLAYLISTS_FILE = "playlists.txt"
 CHANNELS_FILE = "channels.txt"
 STATE_FILE = "state.json"
+METADATA_CACHE_FILE = "metadata_cache.sqlite"
 
 CHECK_INTERVAL_SECONDS = 15 * 60
+MONITOR_MAX_BACKOFF_SECONDS = 4 * 60 * 60
+SOURCE_CHECK_WORKERS = 8
+STATE_FLUSH_DELAY_SECONDS = 1
+FFMPEG_STDERR_TAIL_BYTES = 4096
+# Per-download scratch directories inside DOWNLOAD_DIR
+SCRATCH_DIR_PREFIX = ".ytfin-"
+INFO_CACHE_TTL_SECONDS = 60 * 60
+INFO_CACHE_MAX_ENTRIES = 512
 DEFAULT_MAX_RESOLUTION = "1080p"
 DEFAULT_CODEC = "copy"
 DEFAULT_FPS = None
 
+RESOLUTION_RE = re.compile(r"[0-9]{2,4}p")
+YOUTUBE_ID_RE = re.compile(
+    r"(?:youtu\.be/|youtube(?:-nocookie)?\.com/(?:watch\?(?:[^#]*&)?v=|embed/|shorts/|live/|v/))"
+    r"([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])"
+)
+VALID_CODECS = frozenset({"copy", "h264", "hevc"})
+
+# Prefer a natively available codec instead of converting after download
+CODEC_FORMAT_SORT = {
+    "h264": "vcodec:h264",
+    "hevc": "vcodec:h265",
+}
+
+SERVER_HOST = os.environ.get("YTFIN_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("YTFIN_PORT", "4999"))
+SERVER_THREADS = int(os.environ.get("YTFIN_THREADS", "16"))
+DEBUG = os.environ.get("YTFIN_DEBUG") == "1"
+# nginx internal location that aliases DOWNLOAD_DIR, e.g. "/internal-downloads/"
+X_ACCEL_REDIRECT_PREFIX = os.environ.get("YTFIN_X_ACCEL_PREFIX")
+
 ADMIN_USERNAME = os.environ.get("YTFIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.environ.get("YTFIN_PASSWORD", "admin")
 SESSION_TOKEN = uuid.uuid4().hex
 
 # Check if FFmpeg is available
 FFMPEG_AVAILABLE = shutil.which('ffmpeg') is not None
+# aria2c, when installed, fetches with multiple connections per file
+ARIA2C_AVAILABLE = shutil.which('aria2c') is not None
+
+FRAGMENT_CONCURRENCY = int(os.environ.get("YTFIN_FRAGMENT_CONCURRENCY", "16"))
+
+# yt-dlp options that never change between calls. YoutubeDL keeps and mutates
+# the dict it is given, so always pass a copy.
+INFO_YDL_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "cachedir": YTDLP_CACHE_DIR,
+    # For playlist URLs only the first video needs full extraction
+    "noplaylist": True,
+    "playlist_items": "1",
+}
+
+FLAT_YDL_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "extract_flat": True,
+    "cachedir": YTDLP_CACHE_DIR
+}
+
+# Per-job keys (format, outtmpl, progress_hooks) are added in download_video.
+# Subtitles are fetched as separate requests; drop writesubtitles/writeautomaticsub
+# here if they are not wanted, to save a round trip per video.
+DOWNLOAD_YDL_OPTS = {
+    "merge_output_format": "mkv",
+    "quiet": False,
+    "no_warnings": False,
+    "cachedir": YTDLP_CACHE_DIR,
+    "noplaylist": True,
+    "playlist_items": "1",
+    "windowsfilenames": True,
+    "restrictfilenames": True,
+    "nopart": True,
+    "concurrent_fragment_downloads": FRAGMENT_CONCURRENCY,
+    # Native downloader: 10 MB ranged requests read in 1 MB blocks
+    "http_chunk_size": 10 * 1024 * 1024,
+    "buffersize": 1 << 20,
+    "retries": 5,
+    "fragment_retries": 5,
+    "sleep_interval": 1,
+    "max_sleep_interval": 5,
+    "sleep_interval_requests": 2,
+    "writeinfojson": True,
+    "writethumbnail": True,
+    "convertthumbnails": "jpg",
+    "writesubtitles": True,
+    "writeautomaticsub": True,
+    "subtitleslangs": ["en"],
+    "subtitlesformat": "srt",
+}
+if ARIA2C_AVAILABLE:
+    DOWNLOAD_YDL_OPTS["external_downloader"] = "aria2c"
+    DOWNLOAD_YDL_OPTS["external_downloader_args"] = {
+        # -s must match -x or aria2c caps the split at 5 connections
+        "aria2c": ["-x", "16", "-s", "16", "-k", "1M", "--file-allocation=none", "--summary-interval=0"]
+    }
 
 
 def _is_authenticated():
@@ -59,7 +167,7 @@ def _require_auth():
         return None
     if _is_authenticated():
         return None
-    if request.path.startswith("/api/") or request.path == "/download":
+    if request.path.startswith(("/api/", "/download/")) or request.path == "/download":
         return jsonify({"error": "Unauthorized"}), 401
     return redirect(url_for("login"))
 
@@ -73,66 +181,110 @@ def _ensure_source_files():
 
 def _load_state():
     if not os.path.exists(STATE_FILE):
-        return {"downloaded_ids": []}
+        return {"downloaded_ids": set()}
     try:
         with open(STATE_FILE, "r", encoding="utf-8") as handle:
             data = json.load(handle)
             if not isinstance(data, dict):
-                return {"downloaded_ids": []}
-            return {"downloaded_ids": list(set(data.get("downloaded_ids", [])))}
+                return {"downloaded_ids": set()}
+            return {"downloaded_ids": set(data.get("downloaded_ids", []))}
     except (json.JSONDecodeError, OSError):
-        return {"downloaded_ids": []}
+        return {"downloaded_ids": set()}
 
 
 def _save_state(state):
+    temp_path = f"{STATE_FILE}.tmp"
     try:
-        with open(STATE_FILE, "w", encoding="utf-8") as handle:
-            json.dump(state, handle, indent=2)
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            # Kept as a set in memory for O(1) lookups; stored as a sorted list
+            json.dump(
+                {**state, "downloaded_ids": sorted(state["downloaded_ids"])},
+                handle,
+                separators=(",", ":")
+            )
+        # Swap in atomically so a crash never leaves a truncated state file
+        os.replace(temp_path, STATE_FILE)
     except OSError:
         logging.exception("Failed to write state file")
 
 
+def _open_metadata_db():
+    try:
+        conn = sqlite3.connect(METADATA_CACHE_FILE, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            "video_id TEXT PRIMARY KEY, fetched_at INTEGER NOT NULL, json BLOB NOT NULL)"
+        )
+        conn.execute("DELETE FROM meta WHERE fetched_at <= ?", (int(time.time()) - INFO_CACHE_TTL_SECONDS,))
+        conn.commit()
+        return conn
+    except sqlite3.Error:
+        logging.exception("Failed to open metadata cache, continuing without it")
+        return None
+
+
 STATE_LOCK = threading.Lock()
 STATE = _load_state()
+STATE_DIRTY = threading.Event()
+# Serializes _flush_state between the writer thread and the atexit hook
+STATE_WRITE_LOCK = threading.Lock()
 INFLIGHT_LOCK = threading.Lock()
 INFLIGHT_IDS = set()
+INFO_CACHE_LOCK = threading.Lock()
+INFO_CACHE = OrderedDict()
+INFO_YDL = threading.local()
+# On-disk copy of INFO_CACHE keyed by video id, so restarts skip re-extraction
+METADATA_DB_LOCK = threading.Lock()
+# Opened by create_app(); None until then, or if the file can't be opened
+METADATA_DB = None
+# Parsed source files keyed by path: (mtime_ns, size, lines)
+SOURCES_CACHE_LOCK = threading.Lock()
+SOURCES_CACHE = {}
 
 
 def _extract_video_id_from_name(file_name):
-    if "[" not in file_name or "]" not in file_name:
+    _, open_bracket, rest = file_name.rpartition("[")
+    if not open_bracket:
         return None
-    return file_name.split("[")[-1].split("]")[0]
+    video_id, close_bracket, _ = rest.partition("]")
+    return video_id if close_bracket else None
 
 
-def _has_downloaded_file(video_id):
-    if not video_id:
-        return False
-    marker = f"[{video_id}]"
-    for path in Path(DOWNLOAD_DIR).iterdir():
-        if not path.is_file():
-            continue
-        if marker in path.name and path.suffix.lower() in (".mkv", ".mp4"):
-            return True
-    return False
+def _bootstrap_state_from_downloads():
+    """Record ids of files already in DOWNLOAD_DIR; returns how many were new."""
+    added = 0
+    with os.scandir(DOWNLOAD_DIR) as entries:
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext not in (".mkv", ".mp4", ".nfo", ".json"):
+                continue
+            if ext == ".json" and not entry.name.endswith(".info.json"):
+                continue
+            if not entry.is_file():
+                continue
+            video_id = _extract_video_id_from_name(name)
+            if not video_id:
+                continue
+            with STATE_LOCK:
+                if video_id not in STATE["downloaded_ids"]:
+                    STATE["downloaded_ids"].add(video_id)
+                    added += 1
+    if added:
+        STATE_DIRTY.set()
+    return added
 
 
-def _bootstrap_state_from_downloads():
-    updated = False
-    for path in Path(DOWNLOAD_DIR).iterdir():
-        if not path.is_file() or path.suffix.lower() not in (".mkv", ".mp4", ".nfo", ".json"):
-            continue
-        name = path.stem
-        if path.suffix.lower() == ".json" and not path.name.endswith(".info.json"):
-            continue
-        video_id = _extract_video_id_from_name(name)
-        if not video_id:
-            continue
-        with STATE_LOCK:
-            if video_id not in STATE["downloaded_ids"]:
-                STATE["downloaded_ids"].append(video_id)
-                updated = True
-    if updated:
-        _save_state(STATE)
+def _remove_stale_scratch_dirs():
+    # Left behind when the process died mid-download; nothing is running yet at startup
+    with os.scandir(DOWNLOAD_DIR) as entries:
+        stale = [entry.path for entry in entries
+                 if entry.name.startswith(SCRATCH_DIR_PREFIX) and entry.is_dir(follow_symlinks=False)]
+    for path in stale:
+        logging.info("Removing stale scratch directory %s", path)
+        shutil.rmtree(path, ignore_errors=True)
 
 
 def _remember_downloaded(video_id):
@@ -140,8 +292,31 @@ def _remember_downloaded(video_id):
         return
     with STATE_LOCK:
         if video_id not in STATE["downloaded_ids"]:
-            STATE["downloaded_ids"].append(video_id)
-            _save_state(STATE)
+            STATE["downloaded_ids"].add(video_id)
+            STATE_DIRTY.set()
+
+
+def _flush_state():
+    with STATE_WRITE_LOCK:
+        if not STATE_DIRTY.is_set():
+            return
+        STATE_DIRTY.clear()
+        with STATE_LOCK:
+            snapshot = {**STATE, "downloaded_ids": set(STATE["downloaded_ids"])}
+        _save_state(snapshot)
+
+
+def _state_writer_loop():
+    while True:
+        STATE_DIRTY.wait()
+        # Coalesce bursts of completions into a single write
+        time.sleep(STATE_FLUSH_DELAY_SECONDS)
+        _flush_state()
+
+
+state_writer_thread = threading.Thread(target=_state_writer_loop, daemon=True)
+state_writer_thread.start()
+atexit.register(_flush_state)
 
 
 def _is_inflight(video_id):
@@ -152,10 +327,14 @@ def _is_inflight(video_id):
 
 
 def _mark_inflight(video_id):
+    """Mark a video as queued; returns False if another check already claimed it."""
     if not video_id:
-        return
+        return False
     with INFLIGHT_LOCK:
+        if video_id in INFLIGHT_IDS:
+            return False
         INFLIGHT_IDS.add(video_id)
+        return True
 
 
 def _clear_inflight(video_id):
@@ -165,37 +344,154 @@ def _clear_inflight(video_id):
         INFLIGHT_IDS.discard(video_id)
 
 
-def get_available_resolutions(url):
-    """Extract available resolutions for a given video URL"""
+def _info_cache_key(url):
+    return _extract_video_id(url) or url
+
+
+def _info_ydl():
+    # YoutubeDL instances are not safe to share across threads, so keep one per thread
+    ydl = getattr(INFO_YDL, "ydl", None)
+    if ydl is None:
+        ydl = yt_dlp.YoutubeDL(dict(INFO_YDL_OPTS))
+        INFO_YDL.ydl = ydl
+    return ydl
+
+
+def _first_video(info):
+    if info and info.get('_type') == 'playlist':
+        entries = info.get('entries') or []
+        if entries:
+            return entries[0]
+    return info
+
+
+def _load_cached_info(video_id):
+    """Return (age_seconds, info) for a fresh on-disk entry, or None."""
+    if METADATA_DB is None:
+        return None
+    now = int(time.time())
     try:
-        ydl_opts = {
-            'quiet': False,
-            'no_warnings': False,
+        with METADATA_DB_LOCK:
+            row = METADATA_DB.execute(
+                "SELECT fetched_at, json FROM meta WHERE video_id = ? AND fetched_at > ?",
+                (video_id, now - INFO_CACHE_TTL_SECONDS)
+            ).fetchone()
+        if row is None:
+            return None
+        return max(now - row[0], 0), json.loads(row[1])
+    except (sqlite3.Error, ValueError):
+        logging.exception("Failed to read metadata cache entry for %s", video_id)
+        return None
+
+
+def _store_cached_info(video_id, info):
+    if METADATA_DB is None:
+        return
+    try:
+        payload = json.dumps(yt_dlp.YoutubeDL.sanitize_info(info), separators=(",", ":"))
+        with METADATA_DB_LOCK:
+            METADATA_DB.execute(
+                "INSERT OR REPLACE INTO meta (video_id, fetched_at, json) VALUES (?, ?, ?)",
+                (video_id, int(time.time()), payload)
+            )
+            METADATA_DB.commit()
+    except (sqlite3.Error, TypeError, ValueError):
+        logging.exception("Failed to write metadata cache entry for %s", video_id)
+
+
+def _delete_cached_info(video_id=None):
+    if METADATA_DB is None:
+        return
+    try:
+        with METADATA_DB_LOCK:
+            if video_id is None:
+                METADATA_DB.execute("DELETE FROM meta")
+            else:
+                METADATA_DB.execute("DELETE FROM meta WHERE video_id = ?", (video_id,))
+            METADATA_DB.commit()
+    except sqlite3.Error:
+        logging.exception("Failed to clear metadata cache")
+
+
+def _cache_info(key, info, age=0):
+    with INFO_CACHE_LOCK:
+        INFO_CACHE[key] = (time.monotonic() - age, info)
+        INFO_CACHE.move_to_end(key)
+        while len(INFO_CACHE) > INFO_CACHE_MAX_ENTRIES:
+            INFO_CACHE.popitem(last=False)
+
+
+def _get_info(url):
+    """Return yt-dlp metadata for a URL, reusing a recent extraction when possible."""
+    key = _info_cache_key(url)
+    now = time.monotonic()
+    with INFO_CACHE_LOCK:
+        cached = INFO_CACHE.get(key)
+        if cached and now - cached[0] < INFO_CACHE_TTL_SECONDS:
+            INFO_CACHE.move_to_end(key)
+            return cached[1]
+
+    # Only single videos are persisted; other URLs are keyed by the URL itself
+    video_id = key if key != url else None
+    if video_id:
+        stored = _load_cached_info(video_id)
+        if stored:
+            age, info = stored
+            _cache_info(key, info, age)
+            return info
+
+    info = _first_video(_info_ydl().extract_info(url, download=False))
+
+    _cache_info(key, info)
+    if video_id:
+        _store_cached_info(video_id, info)
+    return info
+
+
+def _forget_info(url):
+    key = _info_cache_key(url)
+    with INFO_CACHE_LOCK:
+        INFO_CACHE.pop(key, None)
+    if key != url:
+        _delete_cached_info(key)
+
+
+def _clear_info_cache():
+    with INFO_CACHE_LOCK:
+        INFO_CACHE.clear()
+    _delete_cached_info()
+
+
+def get_available_formats(url):
+    """Extract available resolutions and FPS values for a given video URL in one pass"""
+    try:
+        info = _get_info(url)
+
+        # Get available formats
+        formats = info.get('formats', [])
+        heights = set()
+        fps_values = set()
+
+        for fmt in formats:
+            if fmt.get('vcodec') != 'none':  # Only video formats
+                height = fmt.get('height')
+                if height:
+                    heights.add(height)
+                fps = fmt.get('fps')
+                if fps:
+                    fps_values.add(int(fps))
+
+        # Sort as numbers in descending order, then format as "720p"
+        resolution_list = [f"{height}p" for height in sorted(heights, reverse=True)]
+        fps_list = sorted(fps_values, reverse=True)
+
+        return {
+            'success': True,
+            'title': info.get('title'),
+            'resolutions': resolution_list,
+            'available_fps': fps_list,
+            'original_fps': formats[0].get('fps') if formats else None
         }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # Get available formats
-            formats = info.get('formats', [])
-            resolutions = set()
-            
-            for fmt in formats:
-                if fmt.get('vcodec') != 'none':  # Only video formats
-                    height = fmt.get('height')
-                    if height:
-                        resolutions.add(f"{height}p")
-            
-            # Sort resolutions
-            resolution_list = sorted(list(resolutions), 
-                                    key=lambda x: int(x[:-1]), 
-                                    reverse=True)
-            
-            return {
-                'success': True,
-                'title': info.get('title'),
-                'resolutions': resolution_list
-            }
     
     except Exception as e:
         return {
@@ -204,46 +500,39 @@ def get_available_resolutions(url):
         }
 
 
+def get_available_resolutions(url):
+    """Extract available resolutions for a given video URL"""
+    result = get_available_formats(url)
+    if not result['success']:
+        return result
+    return {
+        'success': True,
+        'title': result['title'],
+        'resolutions': result['resolutions']
+    }
+
+
 def get_available_fps(url):
     """Extract available FPS values for a given video URL"""
-    try:
-        ydl_opts = {
-            'quiet': False,
-            'no_warnings': False,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # Get available formats
-            formats = info.get('formats', [])
-            fps_values = set()
-            
-            for fmt in formats:
-                if fmt.get('vcodec') != 'none':  # Only video formats
-                    fps = fmt.get('fps')
-                    if fps:
-                        fps_values.add(int(fps))
-            
-            # Sort FPS values in descending order
-            fps_list = sorted(list(fps_values), reverse=True)
-            
-            return {
-                'success': True,
-                'title': info.get('title'),
-                'available_fps': fps_list,
-                'original_fps': formats[0].get('fps') if formats else None
-            }
-    
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+    result = get_available_formats(url)
+    if not result['success']:
+        return result
+    return {
+        'success': True,
+        'title': result['title'],
+        'available_fps': result['available_fps'],
+        'original_fps': result['original_fps']
+    }
 
 
-def _build_format_string(resolution):
-    return f"bestvideo[height<={resolution[:-1]}]+bestaudio/best[height<={resolution[:-1]}]"
+def _build_format_options(resolution, codec=DEFAULT_CODEC):
+    format_sort = [f"res:{resolution[:-1]}"]
+    if codec in CODEC_FORMAT_SORT:
+        format_sort.append(CODEC_FORMAT_SORT[codec])
+    return {
+        "format": "bv*+ba/b",
+        "format_sort": format_sort,
+    }
 
 
 def _ensure_url(entry):
@@ -264,91 +553,60 @@ def _safe_title(title):
     return sanitize_filename(title, restricted=True)
 
 
-def _collect_sidecar_files(base_name):
-    directory = Path(DOWNLOAD_DIR)
-    subtitles = sorted(directory.glob(f"{base_name}.*.srt"))
-    if not subtitles:
-        subtitles = sorted(directory.glob(f"{base_name}.*.vtt"))
-
+def _collect_sidecar_files(directory, base_name):
+    # One directory pass instead of a glob per subtitle type and a stat per thumbnail type
+    prefix = f"{base_name}."
+    srt_files, vtt_files, thumbnails = [], [], {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix):
+                continue
+            suffix = entry.name[len(prefix):]
+            if suffix.endswith(".srt"):
+                srt_files.append(Path(entry.path))
+            elif suffix.endswith(".vtt"):
+                vtt_files.append(Path(entry.path))
+            elif suffix in ("jpg", "jpeg", "png", "webp"):
+                thumbnails[suffix] = Path(entry.path)
+
+    subtitles = sorted(srt_files) or sorted(vtt_files)
     thumbnail = None
     for ext in ("jpg", "jpeg", "png", "webp"):
-        candidate = directory / f"{base_name}.{ext}"
-        if candidate.exists():
-            thumbnail = candidate
+        if ext in thumbnails:
+            thumbnail = thumbnails[ext]
             break
     return thumbnail, subtitles
 
 
-def _rename_sidecars(temp_base_name, base_name):
-    directory = Path(DOWNLOAD_DIR)
-    patterns = [
-        f"{temp_base_name}.info.json",
-        f"{temp_base_name}.*.srt",
-        f"{temp_base_name}.*.vtt",
-        f"{temp_base_name}.jpg",
-        f"{temp_base_name}.jpeg",
-        f"{temp_base_name}.png",
-        f"{temp_base_name}.webp",
-    ]
-    for pattern in patterns:
-        for path in directory.glob(pattern):
-            suffix = path.name[len(temp_base_name):]
-            target = directory / f"{base_name}{suffix}"
-            try:
-                if target.exists():
-                    target.unlink()
-                path.rename(target)
-            except OSError:
-                logging.exception("Failed to rename sidecar %s", path)
-
-
-def _rename_sidecars_by_id(video_id, base_name):
+def _move_sidecars(scratch_dir, video_id, base_name):
     if not video_id:
         return
-    directory = Path(DOWNLOAD_DIR)
-    marker = f"[{video_id}]_temp"
     allowed_ext = (".info.json", ".srt", ".vtt", ".jpg", ".jpeg", ".png", ".webp")
-    for path in directory.iterdir():
-        name = path.name
-        if marker not in name:
-            continue
-        if not name.endswith(allowed_ext):
-            continue
-        suffix = name.split(marker, 1)[1]
-        target = directory / f"{base_name}{suffix}"
-        try:
-            if target.exists():
-                target.unlink()
-            path.rename(target)
-        except OSError:
-            logging.exception("Failed to rename sidecar %s", path)
-
-
-def _cleanup_temp_sidecars(video_id):
-    if not video_id:
-        return
-    directory = Path(DOWNLOAD_DIR)
-    marker = f"[{video_id}]_temp"
-    for path in directory.iterdir():
-        if marker not in path.name:
-            continue
-        if path.suffix == ".webm":
-            continue
-        _remove_path(str(path))
+    with os.scandir(scratch_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.startswith(f"{video_id}."):
+                continue
+            if not name.endswith(allowed_ext):
+                continue
+            suffix = name[len(video_id):]
+            target = os.path.join(DOWNLOAD_DIR, f"{base_name}{suffix}")
+            try:
+                os.replace(entry.path, target)
+            except OSError:
+                logging.exception("Failed to move sidecar %s", entry.path)
 
 
-def _convert_thumbnail_to_jpg(thumbnail_path, base_name):
+def _convert_thumbnail_to_jpg(thumbnail_path):
     if not thumbnail_path:
         return None
     if thumbnail_path.suffix.lower() == ".jpg":
         return thumbnail_path
-    jpg_path = Path(DOWNLOAD_DIR) / f"{base_name}.jpg"
-    result = subprocess.run(
-        ["ffmpeg", "-i", str(thumbnail_path), "-frames:v", "1", str(jpg_path)],
-        capture_output=True,
-        text=True
+    jpg_path = thumbnail_path.with_suffix(".jpg")
+    returncode, _ = _run_ffmpeg(
+        ["ffmpeg", "-i", str(thumbnail_path), "-frames:v", "1", str(jpg_path)]
     )
-    if result.returncode == 0 and jpg_path.exists():
+    if returncode == 0 and jpg_path.exists():
         _remove_path(str(thumbnail_path))
         return jpg_path
     return thumbnail_path
@@ -376,7 +634,7 @@ def _write_nfo(base_name, info):
         ET.SubElement(root, "uniqueid", type="youtube", default="true").text = video_id
 
     tree = ET.ElementTree(root)
-    nfo_path = Path(DOWNLOAD_DIR) / f"{base_name}.nfo"
+    nfo_path = DOWNLOAD_DIR_PATH / f"{base_name}.nfo"
     try:
         tree.write(nfo_path, encoding="utf-8", xml_declaration=True)
     except OSError:
@@ -395,35 +653,89 @@ def _subtitle_lang_from_filename(base_name, file_path):
 
 
 def _remove_path(path, attempts=5, delay=0.5):
-    for _ in range(attempts):
+    if not path:
+        return True
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(delay)
         try:
-            if path and os.path.exists(path):
-                os.remove(path)
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
             return True
         except OSError:
-            time.sleep(delay)
+            continue
     return False
 
 
+def _run_ffmpeg(ffmpeg_cmd):
+    """Run ffmpeg and return (returncode, tail of stderr) without buffering all output."""
+    stderr_tail = b""
+    with subprocess.Popen(
+        ffmpeg_cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    ) as process:
+        # stdout is discarded, so draining stderr here cannot deadlock
+        for chunk in iter(lambda: process.stderr.read(65536), b""):
+            stderr_tail = (stderr_tail + chunk)[-FFMPEG_STDERR_TAIL_BYTES:]
+        returncode = process.wait()
+    # Only the part shown in an error message is ever decoded
+    return returncode, stderr_tail.decode("utf-8", "replace")
+
+
 def _extract_video_id(url):
     if not url:
         return None
-    parsed = urllib.parse.urlparse(url)
-    host = parsed.netloc.lower()
-    if host.endswith("youtu.be"):
-        return parsed.path.lstrip("/") or None
-    if "youtube" in host:
-        query = urllib.parse.parse_qs(parsed.query)
-        if "v" in query and query["v"]:
-            return query["v"][0]
-        parts = parsed.path.strip("/").split("/")
-        if len(parts) >= 2 and parts[0] in ("shorts", "embed"):
-            return parts[1]
-    return None
+    match = YOUTUBE_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def _build_remux_command(temp_file_path, mkv_filename, sidecar_base_name, thumbnail, subtitles, title, channel_name, description):
+    """Build the stream-copy FFmpeg command that writes the final MKV with embedded sidecars."""
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel", "error",
+        "-nostats",
+        "-y",
+        "-i", temp_file_path,
+    ]
 
+    inputs = ([thumbnail] if thumbnail else []) + list(subtitles)
+    for path in inputs:
+        ffmpeg_cmd += ["-i", str(path)]
+
+    ffmpeg_cmd += ["-map", "0:v:0", "-map", "0:a?"]
+    for input_index in range(1, len(inputs) + 1):
+        ffmpeg_cmd += ["-map", str(input_index)]
+
+    ffmpeg_cmd += [
+        "-c:v:0", "copy",
+        "-c:a", "copy",
+        "-c:s", "srt",
+        "-metadata", f"title={title}",
+        "-metadata", f"artist={channel_name}",
+        "-metadata", f"comment={description}",
+        "-metadata", f"description={description}",
+    ]
 
-def download_video(url, resolution, fps=None, codec="copy", cancel_event=None):
+    if thumbnail:
+        ffmpeg_cmd += ["-c:v:1", "mjpeg", "-disposition:v:1", "attached_pic"]
+
+    for index, subtitle in enumerate(subtitles):
+        lang = _subtitle_lang_from_filename(sidecar_base_name, subtitle)
+        if lang:
+            ffmpeg_cmd += [f"-metadata:s:s:{index}", f"language={lang}"]
+
+    ffmpeg_cmd.append(mkv_filename)
+    return ffmpeg_cmd
+
+
+def download_video(url, resolution, fps=None, codec="copy", cancel_event=None, progress_callback=None):
     """Download video at specified resolution and remux to MKV with stream copy."""
+    scratch_dir = None
     try:
         if fps:
             return {
@@ -431,45 +743,44 @@ def download_video(url, resolution, fps=None, codec="copy", cancel_event=None):
                 "error": "FPS changes are not supported with stream copy. Leave FPS empty."
             }
         
-        # Format selection string
-        format_string = _build_format_string(resolution)
+        # Format selection: best streams at or below the requested height
+        format_options = _build_format_options(resolution, codec)
         
-        # Download with temporary name
-        temp_filename = os.path.join(DOWNLOAD_DIR, "%(title)s [%(id)s]_temp.%(ext)s")
+        # Download into a private scratch directory so concurrent jobs never collide
+        # and partial files are removed whatever happens
+        scratch_dir = tempfile.mkdtemp(prefix=SCRATCH_DIR_PREFIX, dir=DOWNLOAD_DIR)
+        temp_filename = os.path.join(scratch_dir, "%(id)s.%(ext)s")
 
         def _progress_hook(progress):
             if cancel_event and cancel_event.is_set():
                 raise yt_dlp.utils.DownloadCancelled()
+            if progress_callback and progress.get("status") == "downloading":
+                # Video and audio are fetched one after another, so this restarts per stream
+                total = progress.get("total_bytes") or progress.get("total_bytes_estimate")
+                if total:
+                    progress_callback(min(100.0, progress.get("downloaded_bytes", 0) * 100.0 / total))
         
         ydl_opts = {
-            "format": format_string,
+            **DOWNLOAD_YDL_OPTS,
+            **format_options,
             "outtmpl": temp_filename,
-            "quiet": False,
-            "no_warnings": False,
             "progress_hooks": [_progress_hook],
-            "windowsfilenames": True,
-            "restrictfilenames": True,
-            "nopart": True,
-            "concurrent_fragment_downloads": 1,
-            "retries": 5,
-            "fragment_retries": 5,
-            "sleep_interval": 1,
-            "max_sleep_interval": 5,
-            "sleep_interval_requests": 2,
-            "writeinfojson": True,
-            "writethumbnail": True,
-            "convertthumbnails": "jpg",
-            "writesubtitles": True,
-            "writeautomaticsub": True,
-            "subtitleslangs": ["en"],
-            "subtitlesformat": "srt",
         }
         
+        # Reuse metadata fetched by /resolutions or /fps instead of extracting again.
+        # Resolved outside the fallback so a failed extraction isn't repeated.
+        cached_info = yt_dlp.YoutubeDL.sanitize_info(_get_info(url), remove_private_keys=True)
+        
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            temp_file_path = ydl.prepare_filename(info)
+            try:
+                info = ydl.process_ie_result(cached_info, download=True)
+            except yt_dlp.utils.DownloadError:
+                # Cached stream URLs may have expired; fall back to a fresh extraction
+                _forget_info(url)
+                info = _first_video(ydl.extract_info(url, download=True))
             title = info.get("title", "video")
             video_id = info.get("id")
+            temp_file_path = os.path.join(scratch_dir, f"{video_id}.{info['ext']}")
             safe_title = _safe_title(title)
             base_name = f"{safe_title} [{video_id}]"
             channel_name = info.get("channel") or info.get("uploader") or ""
@@ -479,75 +790,35 @@ def download_video(url, resolution, fps=None, codec="copy", cancel_event=None):
             # Remux to MKV with stream copy
             if FFMPEG_AVAILABLE:
                 mkv_filename = os.path.join(DOWNLOAD_DIR, f"{base_name}.mkv")
-                _rename_sidecars_by_id(video_id, base_name)
-                thumbnail, subtitles = _collect_sidecar_files(base_name)
-                thumbnail = _convert_thumbnail_to_jpg(thumbnail, base_name)
+                thumbnail, subtitles = _collect_sidecar_files(scratch_dir, video_id)
+                thumbnail = _convert_thumbnail_to_jpg(thumbnail)
                 
-                # Build FFmpeg command
-                ffmpeg_cmd = [
-                    "ffmpeg",
-                    "-nostdin",
-                    "-y",
-                    "-i", temp_file_path,
-                ]
-
-                input_index = 1
-                thumbnail_index = None
-                if thumbnail:
-                    ffmpeg_cmd.extend(["-i", str(thumbnail)])
-                    thumbnail_index = input_index
-                    input_index += 1
-
-                subtitle_indices = []
-                for subtitle in subtitles:
-                    ffmpeg_cmd.extend(["-i", str(subtitle)])
-                    subtitle_indices.append(input_index)
-                    input_index += 1
-
-                ffmpeg_cmd.extend(["-map", "0:v:0", "-map", "0:a?"])
-                if thumbnail_index is not None:
-                    ffmpeg_cmd.extend(["-map", str(thumbnail_index)])
-                for sub_index in subtitle_indices:
-                    ffmpeg_cmd.extend(["-map", str(sub_index)])
-
-                ffmpeg_cmd.extend([
-                    "-c:v:0", "copy",
-                    "-c:a", "copy",
-                    "-c:s", "srt",
-                    "-metadata", f"title={title}",
-                    "-metadata", f"artist={channel_name}",
-                    "-metadata", f"comment={description}",
-                    "-metadata", f"description={description}",
-                ])
-
-                if thumbnail_index is not None:
-                    ffmpeg_cmd.extend(["-c:v:1", "mjpeg", "-disposition:v:1", "attached_pic"])
-
-                for index, subtitle in enumerate(subtitles):
-                    lang = _subtitle_lang_from_filename(base_name, subtitle)
-                    if lang:
-                        ffmpeg_cmd.extend(["-metadata:s:s:{}".format(index), f"language={lang}"])
-
-                ffmpeg_cmd.append(mkv_filename)
-                
-                # Run FFmpeg
-                if os.path.exists(mkv_filename):
-                    _remove_path(mkv_filename)
-
-                result = subprocess.run(
-                    ffmpeg_cmd,
-                    capture_output=True,
-                    text=True,
-                    stdin=subprocess.DEVNULL
-                )
+                if thumbnail or subtitles or not temp_file_path.endswith(".mkv"):
+                    # Remux inside the scratch dir so a failed run never leaves a
+                    # partial "[id].mkv" in the library for the rescan to pick up
+                    remux_path = os.path.join(scratch_dir, f"{video_id}.remux.mkv")
+                    ffmpeg_cmd = _build_remux_command(
+                        temp_file_path,
+                        remux_path,
+                        video_id,
+                        thumbnail,
+                        subtitles,
+                        title,
+                        channel_name,
+                        description
+                    )
+
+                    returncode, stderr = _run_ffmpeg(ffmpeg_cmd)
+                    if returncode == 0:
+                        os.replace(remux_path, mkv_filename)
+                else:
+                    # Nothing to embed and already Matroska: a rename is enough
+                    os.replace(temp_file_path, mkv_filename)
+                    returncode, stderr = 0, ""
                 
-                if result.returncode == 0:
-                    # Remove temporary file (retry to avoid Windows file locks)
-                    _remove_path(temp_file_path)
-
+                if returncode == 0:
                     _remember_downloaded(video_id)
-                    _rename_sidecars_by_id(video_id, base_name)
-                    _cleanup_temp_sidecars(video_id)
+                    _move_sidecars(scratch_dir, video_id, base_name)
                     _write_nfo(base_name, info)
                     
                     return {
@@ -563,7 +834,7 @@ def download_video(url, resolution, fps=None, codec="copy", cancel_event=None):
                 else:
                     return {
                         'success': False,
-                        'error': f'FFmpeg conversion failed: {result.stderr}'
+                        'error': f'FFmpeg conversion failed: {stderr}'
                     }
             else:
                 return {
@@ -581,6 +852,9 @@ def download_video(url, resolution, fps=None, codec="copy", cancel_event=None):
             'success': False,
             'error': str(e)
         }
+    finally:
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
 
 
 class DownloadManager:
@@ -589,6 +863,8 @@ class DownloadManager:
         self.jobs = {}
         self.current_job_id = None
         self.lock = threading.Lock()
+        # Signaled when a job is queued or the queue is resumed
+        self.work_available = threading.Condition(self.lock)
         self.paused = False
         self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
         self.worker_thread.start()
@@ -605,6 +881,8 @@ class DownloadManager:
             "source": source,
             "status": "queued",
             "error": None,
+            "filename": None,
+            "progress": None,
             "cancel_event": threading.Event(),
             "created_at": time.time(),
             "updated_at": time.time()
@@ -612,21 +890,30 @@ class DownloadManager:
         with self.lock:
             self.jobs[job_id] = job
             self.queue.append(job_id)
+            self.work_available.notify()
         return job_id
 
     def list_jobs(self):
         with self.lock:
             return [self._public_job(self.jobs[job_id]) for job_id in self.jobs]
 
+    def get_job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return self._public_job(job) if job else None
+
     def get_queue(self):
         with self.lock:
             return [self._public_job(self.jobs[job_id]) for job_id in self.queue]
 
     def pause(self):
-        self.paused = True
+        with self.lock:
+            self.paused = True
 
     def resume(self):
-        self.paused = False
+        with self.lock:
+            self.paused = False
+            self.work_available.notify_all()
 
     def cancel_current(self):
         with self.lock:
@@ -651,37 +938,37 @@ class DownloadManager:
             "source": job["source"],
             "status": job["status"],
             "error": job["error"],
+            "filename": job["filename"],
+            "progress": job["progress"],
             "created_at": job["created_at"],
             "updated_at": job["updated_at"]
         }
 
     def _worker_loop(self):
         while True:
-            if self.paused:
-                time.sleep(1)
-                continue
-            job_id = None
-            with self.lock:
-                if self.queue:
-                    job_id = self.queue.popleft()
-                    self.current_job_id = job_id
-            if not job_id:
-                time.sleep(1)
-                continue
+            with self.work_available:
+                while self.paused or not self.queue:
+                    self.work_available.wait()
+                job_id = self.queue.popleft()
+                self.current_job_id = job_id
             job = self.jobs.get(job_id)
             if not job:
                 continue
             job["status"] = "downloading"
+            job["progress"] = 0.0
             job["updated_at"] = time.time()
             result = download_video(
                 job["url"],
                 job["resolution"],
                 job["fps"],
                 job["codec"],
-                cancel_event=job["cancel_event"]
+                cancel_event=job["cancel_event"],
+                progress_callback=lambda percent: job.update(progress=round(percent, 1), updated_at=time.time())
             )
             if result["success"]:
                 job["status"] = "completed"
+                job["filename"] = result.get("filename")
+                job["progress"] = 100.0
                 job["updated_at"] = time.time()
             else:
                 job["status"] = "canceled" if result["error"] == "Download canceled" else "failed"
@@ -694,19 +981,25 @@ class DownloadManager:
 
 
 download_manager = DownloadManager()
+# Source checks are network-bound, so extract several playlists/channels at once
+SOURCE_CHECK_POOL = ThreadPoolExecutor(max_workers=SOURCE_CHECK_WORKERS, thread_name_prefix="src-check")
 
 
 def _read_sources(file_path):
-    sources = []
     try:
+        stat = os.stat(file_path)
+        with SOURCES_CACHE_LOCK:
+            cached = SOURCES_CACHE.get(file_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return list(cached[2])
         with open(file_path, "r", encoding="utf-8") as handle:
-            for line in handle:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                sources.append(line)
+            lines = handle.read().splitlines()
     except OSError:
         logging.exception("Failed reading %s", file_path)
+        return []
+    sources = [line for line in map(str.strip, lines) if line and not line.startswith("#")]
+    with SOURCES_CACHE_LOCK:
+        SOURCES_CACHE[file_path] = (stat.st_mtime_ns, stat.st_size, tuple(sources))
     return sources
 
 
@@ -732,79 +1025,108 @@ def _write_source_text(file_path, content):
 def _should_download(video_id):
     if not video_id:
         return False
+    # Files dropped in by hand are picked up by /api/rescan
     with STATE_LOCK:
-        if video_id in STATE["downloaded_ids"]:
-            return False
-    if _has_downloaded_file(video_id):
-        _remember_downloaded(video_id)
-        return False
-    return True
+        return video_id not in STATE["downloaded_ids"]
 
 
 def _check_playlist(url):
-    ydl_opts = {
-        "quiet": True,
-        "no_warnings": True,
-        "extract_flat": True
-    }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+    with yt_dlp.YoutubeDL(dict(FLAT_YDL_OPTS)) as ydl:
         info = ydl.extract_info(url, download=False)
         entries = info.get("entries", []) if info else []
         for entry in entries:
             video_id = entry.get("id")
-            if not _should_download(video_id):
-                continue
             if _is_inflight(video_id):
                 continue
+            if not _should_download(video_id):
+                continue
             video_url = _ensure_url(entry)
-            if video_url:
-                _mark_inflight(video_id)
+            if video_url and _mark_inflight(video_id):
                 download_manager.add_job(video_url, source="playlist", video_id=video_id)
 
 
 def _check_channel(url, limit=10):
-    ydl_opts = {
-        "quiet": True,
-        "no_warnings": True,
-        "extract_flat": True
-    }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+    with yt_dlp.YoutubeDL(dict(FLAT_YDL_OPTS)) as ydl:
         info = ydl.extract_info(url, download=False)
         entries = info.get("entries", []) if info else []
         for entry in entries[:limit]:
             video_id = entry.get("id")
-            if not _should_download(video_id):
-                continue
             if _is_inflight(video_id):
                 continue
+            if not _should_download(video_id):
+                continue
             video_url = _ensure_url(entry)
-            if video_url:
-                _mark_inflight(video_id)
+            if video_url and _mark_inflight(video_id):
                 download_manager.add_job(video_url, source="channel", video_id=video_id)
 
 
+def _prune_ytdlp_cache():
+    cutoff = time.time() - YTDLP_CACHE_MAX_AGE_SECONDS
+    for root, _, files in os.walk(YTDLP_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    _remove_path(path, attempts=1)
+            except OSError:
+                continue
+
+
 def background_monitor():
     _ensure_source_files()
+    delay = CHECK_INTERVAL_SECONDS
     while True:
         try:
-            run_playlist_check()
-            run_channel_check()
+            _prune_ytdlp_cache()
+            playlists = run_playlist_check()
+            channels = run_channel_check()
+            checked = playlists["checked"] + channels["checked"]
+            failed = len(playlists["failed"]) + len(channels["failed"])
+            # A single dead source shouldn't slow the rest; only back off when
+            # YouTube is throttling or nothing could be checked at all
+            systemic = playlists["throttled"] or channels["throttled"] or (checked and failed == checked)
         except Exception:
             logging.exception("Monitor loop error")
+            systemic = True
+
+        if systemic:
+            # Back off with jitter so a 429 window isn't hit again on schedule
+            delay = min(delay * 2, MONITOR_MAX_BACKOFF_SECONDS) + random.uniform(0, 30)
+            logging.warning("Source checks failing, next check in %d s", delay)
+        else:
+            delay = CHECK_INTERVAL_SECONDS
 
-        time.sleep(CHECK_INTERVAL_SECONDS)
+        time.sleep(delay)
+
+
+def _run_source_checks(check, sources):
+    """Check sources in parallel; one failing source doesn't stop the others."""
+    futures = [SOURCE_CHECK_POOL.submit(check, source) for source in sources]
+    failed = []
+    throttled = False
+    for source, future in zip(sources, futures):
+        try:
+            future.result()
+        except Exception as exc:
+            failed.append(source)
+            throttled = throttled or "HTTP Error 429" in str(exc)
+            logging.exception("Failed checking %s", source)
+    return {"checked": len(sources), "failed": failed, "throttled": throttled}
 
 
 def run_playlist_check():
-    playlists = _read_sources(PLAYLISTS_FILE)
-    for playlist_url in playlists:
-        _check_playlist(playlist_url)
+    return _run_source_checks(_check_playlist, _read_sources(PLAYLISTS_FILE))
 
 
 def run_channel_check():
-    channels = _read_sources(CHANNELS_FILE)
-    for channel_url in channels:
-        _check_channel(channel_url)
+    return _run_source_checks(_check_channel, _read_sources(CHANNELS_FILE))
+
+
+def _conditional_json(payload):
+    # Repeat lookups of the same video get a 304 with no body
+    response = jsonify(payload)
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app.route('/resolutions', methods=['GET'])
@@ -818,7 +1140,7 @@ def get_resolutions():
     result = get_available_resolutions(url)
     
     if result['success']:
-        return jsonify(result), 200
+        return _conditional_json(result)
     else:
         return jsonify(result), 400
 
@@ -834,7 +1156,23 @@ def get_fps():
     result = get_available_fps(url)
     
     if result['success']:
-        return jsonify(result), 200
+        return _conditional_json(result)
+    else:
+        return jsonify(result), 400
+
+
+@app.route('/formats', methods=['GET'])
+def get_formats():
+    """GET endpoint to fetch available resolutions and FPS values in one request"""
+    url = request.args.get('url')
+    
+    if not url:
+        return jsonify({'error': 'URL parameter is required'}), 400
+    
+    result = get_available_formats(url)
+    
+    if result['success']:
+        return _conditional_json(result)
     else:
         return jsonify(result), 400
 
@@ -876,9 +1214,12 @@ def download():
     if not url or not resolution:
         return jsonify({"error": "URL and resolution parameters are required"}), 400
 
-    if not resolution.endswith("p"):
+    if not isinstance(resolution, str) or not RESOLUTION_RE.fullmatch(resolution):
         return jsonify({"error": "Resolution must be in format like \"720p\""}), 400
 
+    if codec not in VALID_CODECS:
+        return jsonify({"error": "Codec must be one of \"copy\", \"h264\" or \"hevc\""}), 400
+
     if fps:
         try:
             fps = int(fps)
@@ -898,6 +1239,29 @@ def download():
     return jsonify({"success": True, "job_id": job_id}), 202
 
 
+@app.route('/download/<job_id>', methods=['GET'])
+def download_status(job_id):
+    """GET endpoint to report the status and progress of a queued download"""
+    job = download_manager.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+
+@app.route('/files/<path:name>', methods=['GET'])
+def download_file(name):
+    """GET endpoint to serve a finished download"""
+    if X_ACCEL_REDIRECT_PREFIX:
+        path = safe_join(str(DOWNLOAD_DIR_PATH), name)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        # nginx streams the file itself with sendfile(2)
+        response = app.response_class(mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = X_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + urllib.parse.quote(name)
+        return response
+    return send_from_directory(DOWNLOAD_DIR_PATH, name, conditional=True)
+
+
 @app.route('/api/jobs', methods=['GET'])
 def api_jobs():
     return jsonify({
@@ -928,8 +1292,8 @@ def api_stop_current():
 @app.route('/api/check/playlists', methods=['POST'])
 def api_check_playlists():
     try:
-        run_playlist_check()
-        return jsonify({"success": True}), 200
+        result = run_playlist_check()
+        return jsonify({"success": not result["failed"], "failed": result["failed"]}), 200
     except Exception as exc:
         return jsonify({"success": False, "error": str(exc)}), 500
 
@@ -937,12 +1301,27 @@ def api_check_playlists():
 @app.route('/api/check/channels', methods=['POST'])
 def api_check_channels():
     try:
-        run_channel_check()
-        return jsonify({"success": True}), 200
+        result = run_channel_check()
+        return jsonify({"success": not result["failed"], "failed": result["failed"]}), 200
     except Exception as exc:
         return jsonify({"success": False, "error": str(exc)}), 500
 
 
+@app.route('/api/rescan', methods=['POST'])
+def api_rescan():
+    try:
+        added = _bootstrap_state_from_downloads()
+        return jsonify({"success": True, "added": added}), 200
+    except OSError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 500
+
+
+@app.route('/api/cache/clear', methods=['POST'])
+def api_clear_cache():
+    _clear_info_cache()
+    return jsonify({"success": True}), 200
+
+
 @app.route('/api/sources', methods=['GET'])
 def api_get_sources():
     return jsonify({
@@ -970,14 +1349,35 @@ def health():
     """Health check endpoint"""
     return jsonify({
         'status': 'ok',
-        'ffmpeg_available': FFMPEG_AVAILABLE
+        'ffmpeg_available': FFMPEG_AVAILABLE,
+        'aria2c_available': ARIA2C_AVAILABLE
     }), 200
 
 
+STARTUP_LOCK = threading.Lock()
+STARTED = False
+
+
+def create_app():
+    """Run one-time startup and return the app, for external WSGI servers."""
+    global STARTED, METADATA_DB
+    with STARTUP_LOCK:
+        if not STARTED:
+            _ensure_source_files()
+            _remove_stale_scratch_dirs()
+            _bootstrap_state_from_downloads()
+            METADATA_DB = _open_metadata_db()
+            monitor_thread = threading.Thread(target=background_monitor, daemon=True)
+            monitor_thread.start()
+            STARTED = True
+    return app
+
+
 if __name__ == '__main__':
-    _ensure_source_files()
-    _bootstrap_state_from_downloads()
-    if os.environ.get("WERKZEUG_RUN_MAIN") == "true" or not app.debug:
-        monitor_thread = threading.Thread(target=background_monitor, daemon=True)
-        monitor_thread.start()
-    app.run(debug=True, host='0.0.0.0', port=4999)
+    if DEBUG:
+        # The reloader runs the app in a child process; only start up there
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            create_app()
+        app.run(debug=True, host=SERVER_HOST, port=SERVER_PORT)
+    else:
+        serve(create_app(), host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS)
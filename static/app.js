@@ -6,6 +6,8 @@ const resumeBtn = document.getElementById("resume");
 const stopBtn = document.getElementById("stop-current");
 const checkPlaylistsBtn = document.getElementById("check-playlists");
 const checkChannelsBtn = document.getElementById("check-channels");
+const rescanBtn = document.getElementById("rescan");
+const clearCacheBtn = document.getElementById("clear-cache");
 const saveSourcesBtn = document.getElementById("save-sources");
 const playlistsEl = document.getElementById("playlists");
 const channelsEl = document.getElementById("channels");
@@ -35,7 +37,7 @@ function renderJobs(data) {
     const node = document.createElement("div");
     node.className = "job";
     node.innerHTML = `
-      <strong>${job.status.toUpperCase()}</strong>
+      <strong>${job.status.toUpperCase()}${job.status === "downloading" && job.progress !== null ? ` ${job.progress}%` : ""}</strong>
       <div>${job.url}</div>
       <div class="meta">
         <span>${job.source}</span>
@@ -44,6 +46,7 @@ function renderJobs(data) {
         <span>${job.fps || "original fps"}</span>
       </div>
       ${job.error ? `<div class="meta">${job.error}</div>` : ""}
+      ${job.filename ? `<div class="meta"><a href="/files/${encodeURIComponent(job.filename)}">${job.filename}</a></div>` : ""}
     `;
     jobsEl.appendChild(node);
   });
@@ -100,6 +103,14 @@ checkChannelsBtn.addEventListener("click", async () => {
   fetchJobs();
 });
 
+rescanBtn.addEventListener("click", async () => {
+  await post("/api/rescan");
+});
+
+clearCacheBtn.addEventListener("click", async () => {
+  await post("/api/cache/clear");
+});
+
 saveSourcesBtn.addEventListener("click", async () => {
   await post("/api/sources", {
     playlists: playlistsEl.value,
@@ -1,65 +1,56 @@
 import requests
 import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # API base URL
-BASE_URL = "http://localhost:5000"
+BASE_URL = f"http://localhost:{os.environ.get('YTFIN_PORT', '4999')}"
 
 # Test video URL (short public domain video)
 TEST_VIDEO_URL = "https://www.youtube.com/watch?v=BCFAWkS_I8s"
 
+# Set YTFIN_TEST_VERBOSE=1 to print full response bodies
+VERBOSE = os.environ.get("YTFIN_TEST_VERBOSE") == "1"
+
+# One keep-alive session so every call reuses the same connection
+SESSION = requests.Session()
+SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
 def test_health():
     """Test health check endpoint"""
     print("\n=== Testing Health Check ===")
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = SESSION.get(f"{BASE_URL}/health")
         print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.json()}")
+        if VERBOSE:
+            print(f"Response: {response.json()}")
         return response.status_code == 200
     except Exception as e:
         print(f"Error: {e}")
         return False
 
 
-def test_get_resolutions(url):
-    """Test GET resolutions endpoint"""
-    print("\n=== Testing Get Resolutions ===")
-    try:
-        response = requests.get(f"{BASE_URL}/resolutions", params={"url": url})
-        print(f"Status Code: {response.status_code}")
-        result = response.json()
-        print(f"Response: {json.dumps(result, indent=2)}")
-        
-        if result.get('success'):
-            return True, result.get('resolutions', [])
-        return False, []
-    except Exception as e:
-        print(f"Error: {e}")
-        return False, []
-
-
-def test_get_fps(url):
-    """Test GET fps endpoint"""
-    print("\n=== Testing Get Available FPS ===")
+def test_get_formats(url):
+    """Test GET formats endpoint (resolutions and FPS from one lookup)"""
+    print("\n=== Testing Get Formats ===")
     try:
-        response = requests.get(f"{BASE_URL}/fps", params={"url": url})
+        response = SESSION.get(f"{BASE_URL}/formats", params={"url": url})
         print(f"Status Code: {response.status_code}")
         result = response.json()
-        print(f"Response: {json.dumps(result, indent=2)}")
+        if VERBOSE:
+            print(f"Response: {json.dumps(result, indent=2)}")
         
         if result.get('success'):
-            return True, result.get('available_fps', [])
-        return False, []
+            return True, result.get('resolutions', []), result.get('available_fps', [])
+        return False, [], []
     except Exception as e:
         print(f"Error: {e}")
-        return False, []
+        return False, [], []
 
 
-def test_download_video(url, resolution, fps=None, codec='h264'):
-    """Test POST download endpoint"""
-    fps_str = f" at {fps}fps" if fps else ""
-    codec_str = f" ({codec})" if codec != 'h264' else ""
-    print(f"\n=== Testing Download Video at {resolution}{fps_str}{codec_str} ===")
+def request_download(url, resolution, fps=None, codec='h264'):
+    """POST a download job; returns (status_code, result, error) without printing"""
     try:
         payload = {
             "url": url,
@@ -69,19 +60,29 @@ def test_download_video(url, resolution, fps=None, codec='h264'):
         if fps:
             payload["fps"] = fps
             
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/download",
             json=payload,
             headers={"Content-Type": "application/json"}
         )
-        print(f"Status Code: {response.status_code}")
-        result = response.json()
-        print(f"Response: {json.dumps(result, indent=2)}")
-        return result.get('success', False)
+        return response.status_code, response.json(), None
     except Exception as e:
-        print(f"Error: {e}")
-        return False
+        return None, None, e
+
+
+def report_download(resolution, fps, codec, outcome):
+    """Print the result of a request_download call"""
+    fps_str = f" at {fps}fps" if fps else ""
+    codec_str = f" ({codec})" if codec != 'h264' else ""
+    print(f"\n=== Testing Download Video at {resolution}{fps_str}{codec_str} ===")
+    status_code, result, error = outcome
+    if error is not None:
+        print(f"Error: {error}")
         return False
+    print(f"Status Code: {status_code}")
+    if VERBOSE:
+        print(f"Response: {json.dumps(result, indent=2)}")
+    return result.get('success', False)
 
 
 def main():
@@ -97,54 +98,51 @@ def main():
     
     print("✓ Health check passed")
     
-    # Test get resolutions
-    success, resolutions = test_get_resolutions(TEST_VIDEO_URL)
+    # Resolutions and FPS come from the same format list, so fetch them together
+    success, resolutions, fps_values = test_get_formats(TEST_VIDEO_URL)
     if not success:
-        print("\n❌ Failed to get resolutions")
+        print("\n❌ Failed to get formats")
         return
     
     print(f"✓ Got resolutions: {resolutions}")
-    
-    # Test get fps
-    success, fps_values = test_get_fps(TEST_VIDEO_URL)
-    if not success:
-        print("\n❌ Failed to get FPS values")
-        return
-    
     print(f"✓ Got available FPS: {fps_values}")
     
     # Test download with the highest resolution available
     if resolutions:
         highest_resolution = resolutions[0]  # First one is highest
+        selected_fps = fps_values[0] if fps_values else None  # Use highest available fps
         
-        # Test H.264 without fps
-        print(f"\n\nDownloading with {highest_resolution} resolution (H.264)...")
-        if test_download_video(TEST_VIDEO_URL, highest_resolution, codec='h264'):
+        # Each call only enqueues a job, so send them all at once and
+        # report afterwards so the output stays in order
+        downloads = [(highest_resolution, None, 'h264'), (highest_resolution, None, 'hevc')]
+        if selected_fps:
+            downloads.append((highest_resolution, selected_fps, 'hevc'))
+        print(f"\n\nDownloading with {highest_resolution} resolution (H.264, HEVC)...")
+        with ThreadPoolExecutor(max_workers=len(downloads)) as pool:
+            futures = [pool.submit(request_download, TEST_VIDEO_URL, *download) for download in downloads]
+            outcomes = [future.result() for future in futures]
+        results = [report_download(*download, outcome) for download, outcome in zip(downloads, outcomes)]
+
+        if results[0]:
             print(f"✓ H.264 Download started successfully!")
             print("Check the 'downloads/' folder for the video file.")
         else:
             print(f"❌ H.264 Download failed")
         
-        # Test HEVC without fps
-        print(f"\n\nDownloading with {highest_resolution} resolution (HEVC)...")
-        if test_download_video(TEST_VIDEO_URL, highest_resolution, codec='hevc'):
+        if results[1]:
             print(f"✓ HEVC Download started successfully!")
             print("Check the 'downloads/' folder for the video file (smaller file size).")
         else:
             print(f"❌ HEVC Download failed (FFmpeg may not support libx265)")
         
         # Test with specific fps if available
-        if fps_values:
-            selected_fps = fps_values[0]  # Use highest available fps
-            
-            print(f"\n\nDownloading with {highest_resolution} resolution at {selected_fps}fps (HEVC)...")
-            if test_download_video(TEST_VIDEO_URL, highest_resolution, fps=selected_fps, codec='hevc'):
-                print(f"✓ HEVC Download with FPS conversion started successfully!")
-                print("Check the 'downloads/' folder for the video file (MKV format).")
-            else:
-                print(f"❌ HEVC Download with FPS conversion failed (FFmpeg may not be installed)")
-        else:
+        if not selected_fps:
             print("\n⚠ No FPS information available from source")
+        elif results[2]:
+            print(f"✓ HEVC Download with FPS conversion started successfully!")
+            print("Check the 'downloads/' folder for the video file (MKV format).")
+        else:
+            print(f"❌ HEVC Download with FPS conversion failed (FFmpeg may not be installed)")
     else:
         print("\n❌ No resolutions available to test download")
 